@@ -0,0 +1,96 @@
+import os
+import queue
+import threading
+import time
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+from datetime import datetime, time as dtime
+from zoneinfo import ZoneInfo
+
+# ================= TITLE =================
+ALERT_TITLE = "ORB + VWAP BOT"
+
+# ================= ENV =================
+API_KEY = os.environ["KITE_API_KEY"]
+ACCESS_TOKEN = os.environ["KITE_ACCESS_TOKEN"]
+TG_TOKEN = os.environ["TELEGRAM_BOT_TOKEN"]
+TG_CHAT_ID = int(os.environ["TELEGRAM_CHAT_ID"])  # int once, not re-encoded per call
+
+# ================= CONSTANTS =================
+TZ = ZoneInfo("Asia/Kolkata")  # stdlib, C-accelerated; one less dependency
+
+ORB_START = dtime(9, 15)
+ORB_END = dtime(9, 30)
+NO_ENTRY_AFTER = dtime(11, 30)
+
+EXIT_ALERT_TIME = dtime(15, 0)
+MARKET_CLOSE = dtime(15, 15)
+
+MIN_ORB_PCT = 0.25
+RR = 2.0
+
+WATCHLIST = ["TCS", "INFY", "LTIM"]
+WATCHLIST_STR = ", ".join(WATCHLIST)
+
+# ================= TELEGRAM =================
+# one keep-alive session so every alert reuses the same TCP+TLS connection
+TG_URL = f"https://api.telegram.org/bot{TG_TOKEN}/sendMessage"
+TG_SESSION = requests.Session()
+TG_SESSION.mount("https://api.telegram.org", HTTPAdapter(pool_connections=2, pool_maxsize=4))
+
+TG_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# alerts go through a bounded queue drained by a background thread, so a
+# slow or flaky Telegram call never stalls the strategy loop
+TG_QUEUE: queue.Queue = queue.Queue(maxsize=256)
+
+def _post_telegram(msg):
+    # JSON via orjson: faster than the form encoder and unambiguous for
+    # emoji/quotes in alert text
+    TG_SESSION.post(
+        TG_URL,
+        data=orjson.dumps({
+            "chat_id": TG_CHAT_ID,
+            "text": f"🔔 {ALERT_TITLE}\n\n{msg}"
+        }),
+        headers=TG_JSON_HEADERS,
+        timeout=5
+    )
+
+def _drain_telegram():
+    while True:
+        msg = TG_QUEUE.get()
+        for attempt in range(3):
+            try:
+                _post_telegram(msg)
+                break
+            except requests.RequestException:
+                time.sleep(2 ** attempt)
+        TG_QUEUE.task_done()
+
+threading.Thread(target=_drain_telegram, daemon=True).start()
+
+def send_telegram(msg):
+    """Queue msg for the background sender; never blocks the caller."""
+    try:
+        TG_QUEUE.put_nowait(msg)
+    except queue.Full:
+        # drop the oldest alert rather than block or grow unbounded
+        try:
+            TG_QUEUE.get_nowait()
+            TG_QUEUE.task_done()
+        except queue.Empty:
+            pass
+        try:
+            TG_QUEUE.put_nowait(msg)
+        except queue.Full:
+            pass
+
+def flush_telegram():
+    """Block until every queued alert has been attempted (shutdown path)."""
+    TG_QUEUE.join()
+
+# ================= UTILS =================
+def now():
+    return datetime.now(TZ)
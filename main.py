@@ -1,212 +1,460 @@
 import os
 import time
-import requests
-import pandas as pd
-import pytz
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta, time as dtime
 from kiteconnect import KiteConnect
 
-# ================= TITLE =================
-ALERT_TITLE = "ORB + VWAP BOT"
-
-# ================= TELEGRAM TEST =================
-requests.post(
-    f"https://api.telegram.org/bot{os.environ['TELEGRAM_BOT_TOKEN']}/sendMessage",
-    data={
-        "chat_id": os.environ["TELEGRAM_CHAT_ID"],
-        "text": f"🔔 {ALERT_TITLE}\n\nTEST MESSAGE: Railway + Telegram working"
-    },
-    timeout=5
+try:
+    from numba import njit
+except ImportError:  # keep the bot deployable if numba wheels are missing
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda f: f
+
+from common import (
+    API_KEY,
+    ACCESS_TOKEN,
+    TZ,
+    ORB_START,
+    ORB_END,
+    NO_ENTRY_AFTER,
+    EXIT_ALERT_TIME,
+    MARKET_CLOSE,
+    MIN_ORB_PCT,
+    RR,
+    WATCHLIST,
+    WATCHLIST_STR,
+    flush_telegram,
+    now,
+    send_telegram,
 )
-
-# ================= ENV =================
-API_KEY = os.environ["KITE_API_KEY"]
-ACCESS_TOKEN = os.environ["KITE_ACCESS_TOKEN"]
-TG_TOKEN = os.environ["TELEGRAM_BOT_TOKEN"]
-TG_CHAT_ID = os.environ["TELEGRAM_CHAT_ID"]
-
-# ================= CONSTANTS =================
-TZ = pytz.timezone("Asia/Kolkata")
-
-ORB_START = dtime(9, 15)
-ORB_END = dtime(9, 30)
-NO_ENTRY_AFTER = dtime(11, 30)
-
-EXIT_ALERT_TIME = dtime(15, 0)
-MARKET_CLOSE = dtime(15, 15)
-
-MIN_ORB_PCT = 0.25
-RR = 2.0
-
-WATCHLIST = ["TCS", "INFY", "LTIM"]
-
-# ================= UTILS =================
-def now():
-    return datetime.now(TZ)
-
-def send_telegram(msg):
-    requests.post(
-        f"https://api.telegram.org/bot{TG_TOKEN}/sendMessage",
-        data={
-            "chat_id": TG_CHAT_ID,
-            "text": f"🔔 {ALERT_TITLE}\n\n{msg}"
-        },
-        timeout=5
-    )
+from state import open_state
+from ticker import BAR_SECS, LiveBars
+
+# fetches are network-bound, so run one per symbol concurrently
+EXEC = ThreadPoolExecutor(max_workers=len(WATCHLIST))
+
+# ================= ALERT TEMPLATES =================
+# parsed once at import; the hot path only runs .format()
+BUY_TMPL = (
+    "{sym} BUY ALERT\n"
+    "Time: {tm}\n"
+    "Entry: {c:.2f}\n"
+    "SL: {sl:.2f}\n"
+    "Target (2R): {tg:.2f}"
+)
+TARGET_TMPL = (
+    "{sym} SELL ALERT 🎯\n"
+    "Reason: Target Hit\n"
+    "Time: {tm}\n"
+    "Close: {c:.2f}\n"
+    "Target: {tg:.2f}"
+)
+SL_TMPL = (
+    "{sym} SELL ALERT 🛑\n"
+    "Reason: Stop Loss Hit\n"
+    "Time: {tm}\n"
+    "Close: {c:.2f}\n"
+    "SL: {sl:.2f}"
+)
+HEARTBEAT_TMPL = "💓 HEARTBEAT OK\nTime: {tm}"
+START_MSG = f"SYSTEM STARTED\nMarket Open\nWatching: {WATCHLIST_STR}"
+
+def seconds_until(t, tod):
+    """Seconds from t until today's wall-clock time tod (negative if past)."""
+    return (datetime.combine(t.date(), tod, tzinfo=TZ) - t).total_seconds()
+
+def next_tick_secs(t):
+    """Seconds until just past the next 5-minute bar boundary."""
+    return max(1, 300 - ((t.minute % 5) * 60 + t.second) + 1)
+
+# fetch cutoff for symbols without an open trade: one bar plus wakeup
+# slack past NO_ENTRY_AFTER, because the 11:30 bar only becomes the last
+# completed candle at the ~11:35:01 tick. The last_ts gate in the buy
+# logic stays the single source of truth for the entry window itself.
+FETCH_CUTOFF = (
+    datetime(2000, 1, 1, NO_ENTRY_AFTER.hour, NO_ENTRY_AFTER.minute)
+    + timedelta(minutes=5, seconds=30)
+).time()
+
+# session boundaries as epoch seconds, computed once per trading date
+# (IST has no DST, so midnight epoch + wall-clock offset is exact)
+EPOCH_CACHE: dict = {}  # date -> (midnight_e, orb_start_e, orb_end_e, no_entry_e)
+
+def session_epochs(day):
+    epochs = EPOCH_CACHE.get(day)
+    if epochs is None:
+        midnight = int(datetime.combine(day, dtime(0, 0), tzinfo=TZ).timestamp())
+        epochs = (
+            midnight,
+            midnight + ORB_START.hour * 3600 + ORB_START.minute * 60,
+            midnight + ORB_END.hour * 3600 + ORB_END.minute * 60,
+            midnight + NO_ENTRY_AFTER.hour * 3600 + NO_ENTRY_AFTER.minute * 60,
+        )
+        EPOCH_CACHE.clear()  # only the current day is ever needed
+        EPOCH_CACHE[day] = epochs
+    return epochs
 
 # ================= KITE =================
 kite = KiteConnect(api_key=API_KEY)
 kite.set_access_token(ACCESS_TOKEN)
 
-inst = pd.DataFrame(kite.instruments("NSE"))
-TOKENS = {
-    s: int(inst[inst["tradingsymbol"] == s].iloc[0]["instrument_token"])
-    for s in WATCHLIST
+# one pass over the instruments list, then O(1) lookups per symbol
+sym_to_tok = {
+    i["tradingsymbol"]: int(i["instrument_token"])
+    for i in kite.instruments("NSE")
 }
-
-sent_today = set()
-open_trades = {}  # sym -> {entry, sl, target}
-market_start_sent = False
-exit_alert_sent = False
-last_heartbeat_hour = None
+TOKENS = {s: sym_to_tok[s] for s in WATCHLIST}
+
+# ================= LIVE TICKS =================
+# websocket bars feed the candle cache; REST stays only as the seed for
+# prior days and the fallback when the socket has a gap
+LIVE = LiveBars(API_KEY, ACCESS_TOKEN, TOKENS)
+LIVE.start()
+
+# ================= CANDLE CACHE =================
+# per-symbol bar history so each 5-min tick only fetches the delta;
+# bars are stored structure-of-arrays (NumPy) so the strategy math is
+# pure vectorized ops instead of pandas Series overhead
+CANDLE_CACHE: dict[str, dict] = {}  # sym -> {"day": date, "bars": {ts, high, ...}}
+
+def candles_to_arrays(candles):
+    n = len(candles)
+    return {
+        "ts": np.fromiter((c["date"].timestamp() for c in candles), dtype=np.int64, count=n),
+        "high": np.fromiter((c["high"] for c in candles), dtype=np.float64, count=n),
+        "low": np.fromiter((c["low"] for c in candles), dtype=np.float64, count=n),
+        "close": np.fromiter((c["close"] for c in candles), dtype=np.float64, count=n),
+        "volume": np.fromiter((c["volume"] for c in candles), dtype=np.float64, count=n),
+    }
+
+def merge_bars(old, new):
+    # concat + keep the last occurrence of each timestamp, so a refetched
+    # (previously partial) tail bar replaces the cached one
+    ts = np.concatenate([old["ts"], new["ts"]])
+    order = np.argsort(ts, kind="stable")
+    ts = ts[order]
+    keep = np.r_[ts[1:] != ts[:-1], True]
+    merged = {"ts": ts[keep]}
+    for k in ("high", "low", "close", "volume"):
+        merged[k] = np.concatenate([old[k], new[k]])[order][keep]
+    return merged
+
+def fetch_candles(sym, token, t):
+    cached = CANDLE_CACHE.get(sym)
+    if cached is not None and cached["day"] != t.date():
+        cached = None  # new day, refetch the full window
+
+    if cached is None:
+        candles = kite.historical_data(token, t - timedelta(days=3), t, "5minute")
+        if not candles:
+            return None
+        bars = candles_to_arrays(candles)
+        CANDLE_CACHE[sym] = {"day": t.date(), "bars": bars}
+        return bars
+
+    bars = cached["bars"]
+
+    # fold in websocket bars first; they normally cover the whole delta
+    live, gap = LIVE.drain(token)
+    if live:
+        bars = merge_bars(bars, candles_to_arrays(live))
+        cached["bars"] = bars
+
+    if gap:
+        # socket outage left a hole *inside* today's bars, which the
+        # tail-staleness check below can't see (the reconnect bar keeps
+        # the tail fresh). Backfill over REST from the bar just before
+        # the first hole; the REST bars win the merge, repairing both
+        # the missing buckets and the reconnect bar's volume.
+        midnight_e = session_epochs(t.date())[0]
+        day_ts = bars["ts"][bars["ts"] >= midnight_e]
+        holes = np.nonzero(np.diff(day_ts) > BAR_SECS)[0]
+        start_ts = int(day_ts[holes[0]]) if len(holes) else int(bars["ts"][-1])
+        candles = kite.historical_data(
+            token, datetime.fromtimestamp(start_ts, TZ), t, "5minute"
+        )
+        if candles:
+            bars = merge_bars(bars, candles_to_arrays(candles))
+            cached["bars"] = bars
+        return bars
+
+    last_ts = datetime.fromtimestamp(int(bars["ts"][-1]), TZ)
+    if t - last_ts < timedelta(minutes=5):
+        return bars  # up to date, no REST call needed
+
+    # stale tail (no live ticks at all recently): REST delta as fallback
+    candles = kite.historical_data(token, last_ts, t, "5minute")
+    if candles:
+        bars = merge_bars(bars, candles_to_arrays(candles))
+        cached["bars"] = bars
+    return bars
+
+# ================= STATE =================
+# backed by sqlite so a restart mid-session keeps open trades tracked
+# and doesn't re-send today's alerts
+# sym -> {entry, sl, target}; set of (sym, date)
+sent_today, open_trades = open_state(today=now().date())
+
+# ================= HOT KERNELS =================
+# single fused passes over the day's bars, compiled to native code when
+# numba is available; no mask temporaries, no NumPy dispatch overhead
+
+@njit(cache=True, fastmath=True)
+def orb_range(ts, high, low, orb_start_e, orb_end_e):
+    """(orb_high, orb_low) over the opening range; (-inf, inf) if empty."""
+    hi = -np.inf
+    lo = np.inf
+    for i in range(ts.shape[0]):
+        if orb_start_e <= ts[i] < orb_end_e:
+            if high[i] > hi:
+                hi = high[i]
+            if low[i] < lo:
+                lo = low[i]
+    return hi, lo
+
+@njit(cache=True, fastmath=True)
+def vwap_accumulate(ts, high, low, close, volume, last_ts):
+    """(Σ tp·v, Σ v) over bars strictly newer than last_ts."""
+    num = 0.0
+    vol = 0.0
+    for i in range(ts.shape[0]):
+        if ts[i] > last_ts:
+            num += (high[i] + low[i] + close[i]) / 3.0 * volume[i]
+            vol += volume[i]
+    return num, vol
+
+# the opening range is fixed after 9:30, so compute it once per (sym, day);
+# None means the range was too narrow and the symbol is skipped all day
+ORB_CACHE: dict = {}  # (sym, date) -> (orb_high, orb_low) | None
+
+# running (Σ tp·v, Σ v) so VWAP is O(1) per tick instead of a full cumsum;
+# only completed bars are accumulated, so a refetched partial bar never
+# double-counts
+VWAP_STATE: dict = {}  # (sym, date) -> {"num", "vol", "last_ts"}
+
+def update_vwap(key, ts, high, low, close, volume):
+    state = VWAP_STATE.get(key)
+    if state is None:
+        state = {"num": 0.0, "vol": 0.0, "last_ts": 0}
+        VWAP_STATE[key] = state
+
+    if int(ts[-1]) > state["last_ts"]:
+        num, vol = vwap_accumulate(ts, high, low, close, volume, state["last_ts"])
+        state["num"] += num
+        state["vol"] += vol
+        state["last_ts"] = int(ts[-1])
+
+    return state["num"] / state["vol"] if state["vol"] else float("nan")
 
 # ================= MAIN LOOP =================
-while True:
-    try:
-        t = now()
-
-        # -------- HEARTBEAT --------
-        if t.minute == 0 and last_heartbeat_hour != t.hour:
-            send_telegram(f"💓 HEARTBEAT OK\nTime: {t.strftime('%H:%M:%S')}")
-            last_heartbeat_hour = t.hour
-
-        # -------- BEFORE MARKET --------
-        if t.time() < ORB_START:
-            time.sleep(30)
-            continue
-
-        # -------- MARKET START --------
-        if not market_start_sent and t.time() >= ORB_START:
-            send_telegram(
-                "SYSTEM STARTED\n"
-                "Market Open\n"
-                f"Watching: {', '.join(WATCHLIST)}"
-            )
-            market_start_sent = True
-
-        # -------- EXIT REMINDER --------
-        if not exit_alert_sent and t.time() >= EXIT_ALERT_TIME:
-            send_telegram(
-                "EXIT REMINDER\n"
-                "Time: 15:00\n"
-                "Exit all open intraday positions"
-            )
-            exit_alert_sent = True
-
-        # -------- MARKET CLOSE --------
-        if t.time() >= MARKET_CLOSE:
-            send_telegram("MARKET CLOSED\nSystem shutting down")
-            break
-
-        # -------- 5-MIN ALIGNMENT --------
-        if t.minute % 5 != 0:
-            time.sleep(5)
-            continue
-
-        for sym, token in TOKENS.items():
-            candles = kite.historical_data(
-                token,
-                t - timedelta(days=3),
-                t,
-                "5minute"
-            )
-
-            if len(candles) < 20:
-                continue
-
-            df = pd.DataFrame(candles)
-            df["date"] = pd.to_datetime(df["date"])
-            df["date_only"] = df["date"].dt.date
-
-            day = df[df["date_only"] == t.date()].copy()
-            if day.empty:
+def run_strategy():
+    market_start_sent = False
+    exit_alert_sent = False
+    last_heartbeat_hour = None
+    current_date = now().date()
+
+    while True:
+        try:
+            t = now()
+            cur_t = t.time()  # computed once, reused by every branch below
+
+            # -------- DATE ROLLOVER --------
+            # bound memory across multi-day runs: every per-day structure
+            # is keyed or scoped by date, so clear them all here
+            if t.date() != current_date:
+                sent_today.clear()
+                open_trades.clear()
+                open_trades.roll(t.date())  # new writes persist under today
+                ORB_CACHE.clear()
+                VWAP_STATE.clear()
+                market_start_sent = False
+                exit_alert_sent = False
+                current_date = t.date()
+
+            # -------- HEARTBEAT --------
+            if t.minute == 0 and last_heartbeat_hour != t.hour:
+                send_telegram(HEARTBEAT_TMPL.format(tm=t.strftime('%H:%M:%S')))
+                last_heartbeat_hour = t.hour
+
+            # -------- BEFORE MARKET --------
+            if cur_t < ORB_START:
+                # sleep to market open, but wake hourly for the heartbeat
+                time.sleep(max(1, min(
+                    seconds_until(t, ORB_START),
+                    3600 - (t.minute * 60 + t.second),
+                )))
                 continue
 
-            day["time"] = day["date"].dt.time
+            # -------- MARKET START --------
+            if not market_start_sent and cur_t >= ORB_START:
+                send_telegram(START_MSG)
+                market_start_sent = True
 
-            # last completed candle
-            last = day.iloc[-2]
-
-            # ================= SELL LOGIC =================
-            if sym in open_trades:
-                trade = open_trades[sym]
-
-                if last["close"] >= trade["target"]:
-                    send_telegram(
-                        f"{sym} SELL ALERT 🎯\n"
-                        f"Reason: Target Hit\n"
-                        f"Time: {last['date'].strftime('%H:%M')}\n"
-                        f"Close: {last['close']:.2f}\n"
-                        f"Target: {trade['target']:.2f}"
-                    )
-                    del open_trades[sym]
+            # -------- EXIT REMINDER --------
+            if not exit_alert_sent and cur_t >= EXIT_ALERT_TIME:
+                send_telegram(
+                    "EXIT REMINDER\n"
+                    "Time: 15:00\n"
+                    "Exit all open intraday positions"
+                )
+                exit_alert_sent = True
+
+            # -------- MARKET CLOSE --------
+            if cur_t >= MARKET_CLOSE:
+                send_telegram("MARKET CLOSED\nSystem shutting down")
+                break
+
+            midnight_e, orb_start_e, orb_end_e, no_entry_e = session_epochs(t.date())
+
+            # once the entry window can no longer produce a signal, only
+            # open trades need fresh data; skip the fetch and all
+            # downstream work for everything else
+            futures = {
+                EXEC.submit(fetch_candles, sym, token, t): sym
+                for sym, token in TOKENS.items()
+                if cur_t <= FETCH_CUTOFF or sym in open_trades
+            }
+
+            # symbols that clear every entry gate this tick; evaluated in
+            # one vectorized pass after the fetch loop
+            candidates = []
+
+            # strategy logic and state mutation stay on the main thread
+            for fut in as_completed(futures):
+                sym = futures[fut]
+                bars = fut.result()
+
+                if bars is None or len(bars["ts"]) < 20:
                     continue
 
-                if last["close"] <= trade["sl"]:
-                    send_telegram(
-                        f"{sym} SELL ALERT 🛑\n"
-                        f"Reason: Stop Loss Hit\n"
-                        f"Time: {last['date'].strftime('%H:%M')}\n"
-                        f"Close: {last['close']:.2f}\n"
-                        f"SL: {trade['sl']:.2f}"
-                    )
-                    del open_trades[sym]
+                day = bars["ts"] >= midnight_e
+                ts = bars["ts"][day]
+                if len(ts) < 2:
                     continue
 
-            # ================= BUY LOGIC =================
-            key = (sym, t.date())
-            if key in sent_today:
-                continue
+                high = bars["high"][day]
+                low = bars["low"][day]
+                close = bars["close"][day]
+                volume = bars["volume"][day]
+
+                # last completed candle
+                last_i = len(ts) - 2
+                last_ts = int(ts[last_i])
+                last_close = close[last_i]
+                last_hm = datetime.fromtimestamp(last_ts, TZ).strftime("%H:%M")
+
+                # ================= SELL LOGIC =================
+                if sym in open_trades:
+                    trade = open_trades[sym]
+
+                    if last_close >= trade["target"]:
+                        send_telegram(TARGET_TMPL.format(
+                            sym=sym, tm=last_hm, c=last_close, tg=trade["target"]
+                        ))
+                        del open_trades[sym]
+                        continue
+
+                    if last_close <= trade["sl"]:
+                        send_telegram(SL_TMPL.format(
+                            sym=sym, tm=last_hm, c=last_close, sl=trade["sl"]
+                        ))
+                        del open_trades[sym]
+                        continue
+
+                # ================= BUY LOGIC =================
+                key = (sym, t.date())
+                if key in sent_today:
+                    continue
 
-            orb = day[(day["time"] >= ORB_START) & (day["time"] < ORB_END)]
-            if orb.empty:
-                continue
+                if key in ORB_CACHE:
+                    orb = ORB_CACHE[key]
+                else:
+                    orb_hi, orb_lo = orb_range(ts, high, low, orb_start_e, orb_end_e)
+                    if not np.isfinite(orb_hi):
+                        continue
 
-            orb_high = orb["high"].max()
-            orb_low = orb["low"].min()
+                    orb = (orb_hi, orb_lo)
+                    if (orb_hi - orb_lo) / orb_lo * 100 < MIN_ORB_PCT:
+                        orb = None
 
-            if (orb_high - orb_low) / orb_low * 100 < MIN_ORB_PCT:
-                continue
+                    # freeze only once the opening range has fully closed
+                    if last_ts >= orb_end_e:
+                        ORB_CACHE[key] = orb
 
-            tp = (day["high"] + day["low"] + day["close"]) / 3
-            day["vwap"] = (tp * day["volume"]).cumsum() / day["volume"].cumsum()
-
-            if not (ORB_END < last["time"] <= NO_ENTRY_AFTER):
-                continue
+                if orb is None:
+                    continue
 
-            if last["close"] > orb_high and last["close"] > last["vwap"]:
-                sl = max(orb_low, last["vwap"])
-                risk = last["close"] - sl
-                target = last["close"] + RR * risk
+                orb_high, orb_low = orb
 
-                send_telegram(
-                    f"{sym} BUY ALERT\n"
-                    f"Time: {last['date'].strftime('%H:%M')}\n"
-                    f"Entry: {last['close']:.2f}\n"
-                    f"SL: {sl:.2f}\n"
-                    f"Target (2R): {target:.2f}"
+                # VWAP through the last completed candle
+                done = last_i + 1
+                last_vwap = update_vwap(
+                    key, ts[:done], high[:done], low[:done], close[:done], volume[:done]
                 )
 
-                open_trades[sym] = {
-                    "entry": last["close"],
-                    "sl": sl,
-                    "target": target
-                }
-
-                sent_today.add(key)
-
-        time.sleep(5)
+                if not (orb_end_e < last_ts <= no_entry_e):
+                    continue
 
-    except Exception as e:
-        send_telegram(f"ERROR: {e}")
-        time.sleep(60)
+                candidates.append({
+                    "sym": sym,
+                    "key": key,
+                    "hm": last_hm,
+                    "close": last_close,
+                    "vwap": last_vwap,
+                    "orb_high": orb_high,
+                    "orb_low": orb_low,
+                })
+
+            # ================= BATCHED ENTRY CHECK =================
+            # one vector op over all candidate symbols instead of
+            # per-symbol scalar math
+            if candidates:
+                closes = np.array([c["close"] for c in candidates])
+                vwaps = np.array([c["vwap"] for c in candidates])
+                orb_highs = np.array([c["orb_high"] for c in candidates])
+                orb_lows = np.array([c["orb_low"] for c in candidates])
+
+                sls = np.maximum(orb_lows, vwaps)
+                targets = closes + RR * (closes - sls)
+                buys = (closes > orb_highs) & (closes > vwaps)
+
+                for i in np.nonzero(buys)[0]:
+                    cand = candidates[i]
+                    sym = cand["sym"]
+
+                    send_telegram(BUY_TMPL.format(
+                        sym=sym, tm=cand["hm"], c=closes[i], sl=sls[i], tg=targets[i]
+                    ))
+
+                    open_trades[sym] = {
+                        "entry": float(closes[i]),
+                        "sl": float(sls[i]),
+                        "target": float(targets[i])
+                    }
+
+                    sent_today.add(cand["key"])
+
+            # wake exactly at the next bar close or the next timed event,
+            # instead of polling every 5 seconds
+            t = now()
+            delay = next_tick_secs(t)
+            for event in (EXIT_ALERT_TIME, MARKET_CLOSE):
+                secs = seconds_until(t, event)
+                if secs > 0:
+                    delay = min(delay, secs)
+            time.sleep(max(1, delay))
+
+        except Exception as e:
+            send_telegram(f"ERROR: {e}")
+            time.sleep(60)
+
+    flush_telegram()  # make sure the shutdown alert actually goes out
+
+if __name__ == "__main__":
+    # opt-in startup self-test so redeploys don't spam the chat
+    if os.getenv("TG_STARTUP_TEST"):
+        send_telegram("TEST MESSAGE: Railway + Telegram working")
+    run_strategy()
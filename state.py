@@ -0,0 +1,105 @@
+import sqlite3
+from datetime import date
+
+STATE_DB = "state.db"
+
+def open_state(path=STATE_DB, today=None):
+    """Open (creating if needed) the sqlite state file and return the
+    persistent sent_today / open_trades wrappers.
+
+    The purpose is same-day crash recovery, not cross-day carry-over:
+    rows from any other day are purged on open, so a trade left open at
+    yesterday's close can never be resurrected as a live trade today.
+
+    WAL + synchronous=NORMAL keeps each write in the microsecond range
+    while surviving a container restart mid-session.
+    """
+    if today is None:
+        today = date.today()
+
+    conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS sent (sym TEXT, day TEXT, PRIMARY KEY (sym, day))"
+    )
+
+    # drop a pre-day-column trades table; its rows are undated and
+    # therefore untrustworthy across restarts
+    cols = {row[1] for row in conn.execute("PRAGMA table_info(trades)")}
+    if cols and "day" not in cols:
+        conn.execute("DROP TABLE trades")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS trades "
+        "(sym TEXT PRIMARY KEY, day TEXT, entry REAL, sl REAL, target REAL)"
+    )
+
+    day_str = today.isoformat()
+    conn.execute("DELETE FROM sent WHERE day != ?", (day_str,))
+    conn.execute("DELETE FROM trades WHERE day != ?", (day_str,))
+    return PersistentSent(conn), PersistentTrades(conn, day_str)
+
+class PersistentSent:
+    """The sent_today set with write-through to sqlite."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.keys = {
+            (sym, date.fromisoformat(day))
+            for sym, day in conn.execute("SELECT sym, day FROM sent")
+        }
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def add(self, key):
+        if key in self.keys:
+            return
+        self.keys.add(key)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO sent VALUES (?, ?)",
+            (key[0], key[1].isoformat()),
+        )
+
+    def clear(self):
+        self.keys.clear()
+        self.conn.execute("DELETE FROM sent")
+
+class PersistentTrades:
+    """The open_trades dict with write-through to sqlite."""
+
+    def __init__(self, conn, day_str):
+        self.conn = conn
+        self.day_str = day_str
+        self.trades = {
+            sym: {"entry": entry, "sl": sl, "target": target}
+            for sym, entry, sl, target in conn.execute(
+                "SELECT sym, entry, sl, target FROM trades WHERE day = ?",
+                (day_str,),
+            )
+        }
+
+    def roll(self, day):
+        """Stamp subsequent writes with day (called at date rollover)."""
+        self.day_str = day.isoformat()
+
+    def __contains__(self, sym):
+        return sym in self.trades
+
+    def __getitem__(self, sym):
+        return self.trades[sym]
+
+    def __setitem__(self, sym, trade):
+        self.trades[sym] = trade
+        self.conn.execute(
+            "INSERT OR REPLACE INTO trades VALUES (?, ?, ?, ?, ?)",
+            (sym, self.day_str, trade["entry"], trade["sl"], trade["target"]),
+        )
+
+    def __delitem__(self, sym):
+        del self.trades[sym]
+        self.conn.execute("DELETE FROM trades WHERE sym = ?", (sym,))
+
+    def clear(self):
+        self.trades.clear()
+        self.conn.execute("DELETE FROM trades")
@@ -0,0 +1,106 @@
+import threading
+from datetime import datetime
+
+from kiteconnect import KiteTicker
+
+from common import TZ
+
+BAR_SECS = 300  # 5-minute bars
+
+class BarAggregator:
+    """Folds raw ticks into 5-minute OHLCV bars for one instrument.
+
+    Keeps one in-progress bar plus the closed bars not yet drained.
+    Bar volume is derived from the delta of the cumulative day volume
+    the feed reports, so it matches the REST candles.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bar = None       # in-progress bar dict
+        self.closed = []      # closed bars awaiting drain()
+        self.vol_base = None  # cumulative day volume at the last bar close
+        self.gap = False      # buckets skipped since the last drain
+
+    def on_tick(self, price, cum_volume, epoch):
+        bucket = int(epoch) - int(epoch) % BAR_SECS
+        with self.lock:
+            bar = self.bar
+            if bar is not None and bucket < bar["_bucket"]:
+                return  # late tick for an already-closed bucket
+            if bar is None or bar["_bucket"] != bucket:
+                if bar is not None:
+                    self.closed.append(bar)
+                    if bucket != bar["_bucket"] + BAR_SECS:
+                        # socket outage: one or more buckets never got
+                        # ticks; flag it and restart the volume baseline
+                        # so the missed cumulative delta isn't attributed
+                        # to this reconnect bar
+                        self.gap = True
+                        self.vol_base = cum_volume
+                    else:
+                        self.vol_base = bar["_cum"]
+                if self.vol_base is None:
+                    self.vol_base = cum_volume  # subscribed mid-bar
+                bar = self.bar = {
+                    "_bucket": bucket,
+                    "date": datetime.fromtimestamp(bucket, TZ),
+                    "open": price,
+                    "high": price,
+                    "low": price,
+                    "close": price,
+                    "volume": 0.0,
+                    "_cum": cum_volume,
+                }
+
+            if price > bar["high"]:
+                bar["high"] = price
+            if price < bar["low"]:
+                bar["low"] = price
+            bar["close"] = price
+            bar["_cum"] = cum_volume
+            bar["volume"] = max(0.0, cum_volume - self.vol_base)
+
+    def drain(self):
+        """(bars, gap): closed bars since the last drain plus a snapshot
+        of the in-progress bar (it gets replaced on merge once final,
+        exactly like a refetched REST tail bar). gap is True when
+        buckets were skipped since the last drain, meaning the caller
+        must backfill the hole over REST."""
+        with self.lock:
+            out = self.closed
+            self.closed = []
+            if self.bar is not None:
+                out = out + [dict(self.bar)]
+            gap = self.gap
+            self.gap = False
+            return out, gap
+
+class LiveBars:
+    """KiteTicker subscription feeding per-token bar aggregators."""
+
+    def __init__(self, api_key, access_token, tokens):
+        self.aggs = {tok: BarAggregator() for tok in tokens.values()}
+        self.kws = KiteTicker(api_key, access_token)
+        self.kws.on_connect = self._on_connect
+        self.kws.on_ticks = self._on_ticks
+
+    def start(self):
+        self.kws.connect(threaded=True)
+
+    def _on_connect(self, ws, response):
+        tokens = list(self.aggs)
+        ws.subscribe(tokens)
+        ws.set_mode(ws.MODE_FULL, tokens)
+
+    def _on_ticks(self, ws, ticks):
+        for tick in ticks:
+            agg = self.aggs.get(tick["instrument_token"])
+            if agg is None:
+                continue
+            ts = tick.get("exchange_timestamp") or tick.get("last_trade_time")
+            epoch = ts.timestamp() if ts is not None else datetime.now(TZ).timestamp()
+            agg.on_tick(tick["last_price"], float(tick.get("volume_traded") or 0.0), epoch)
+
+    def drain(self, token):
+        return self.aggs[token].drain()